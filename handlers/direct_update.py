@@ -4,23 +4,39 @@ Handles the creation, update, and reconciliation of DirectUpdate resources
 """
 import kopf
 import logging
+import threading
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
+from typing import NamedTuple
 from kubernetes import client
 
 from lib import planner, preflight, state, backup, version
 
 logger = logging.getLogger(__name__)
 
+# Shared pool for fanning out per-node API calls
+_node_api_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix='node-api')
+
 GROUP = "cupcake.ricardomolendijk.com"
 VERSION = "v1"
 PLURAL = "directupdates"
 
+# Node-phase predicate sets, compiled once instead of per reconcile
+_UPGRADING_PHASES = frozenset({'Draining', 'Upgrading', 'Verifying', 'Uncordoning'})
+_CORDON_PHASES = frozenset({'Cordoning', 'Cordoned'})
+# Shared with state.compute_summary so the in-handler and summary
+# tallies always agree on what counts as in flight
+_BUSY_PHASES = state._UPGRADING_PHASES
+_TERMINAL_PHASES = frozenset({'Completed', 'Failed'})
+
 
 @kopf.on.create(GROUP, VERSION, PLURAL)
 def create_direct_update(spec, name, namespace, status, **kwargs):
     """Handle DirectUpdate creation"""
     logger.info(f"DirectUpdate {name} created")
+    now_iso = datetime.now(timezone.utc).isoformat()
     
     # Generate operation ID
     operation_id = str(uuid.uuid4())
@@ -47,7 +63,7 @@ def create_direct_update(spec, name, namespace, status, **kwargs):
     else:
         logger.info(f"Current cluster version: {current_version}")
         
-        target_version = version.Version(target_version_str)
+        target_version = version.parse_version(target_version_str)
         
         # Check if upgrade path is needed
         upgrade_path = version.calculate_upgrade_path(current_version, target_version)
@@ -94,8 +110,8 @@ def create_direct_update(spec, name, namespace, status, **kwargs):
     initial_status = {
         'phase': 'Pending',
         'operationID': operation_id,
-        'startedAt': datetime.now(timezone.utc).isoformat(),
-        'lastUpdated': datetime.now(timezone.utc).isoformat(),
+        'startedAt': now_iso,
+        'lastUpdated': now_iso,
         'message': initial_message,
         'nodes': {},
         'summary': {
@@ -128,14 +144,20 @@ def create_direct_update(spec, name, namespace, status, **kwargs):
             nodes_status[node_name] = {
                 'phase': 'Pending',
                 'lastStep': 'initialized',
-                'startedAt': datetime.now(timezone.utc).isoformat(),
-                'lastUpdated': datetime.now(timezone.utc).isoformat(),
+                'startedAt': now_iso,
+                'lastUpdated': now_iso,
                 'message': 'Waiting to start'
             }
         
         # Update status with plan
         status_update = {
             'nodes': nodes_status,
+            # Recorded so later phases can rebuild the plan without
+            # re-listing nodes
+            'controlPlaneNodes': plan['control_plane_nodes'],
+            # Compact node -> phase map kept alongside the full entries;
+            # hot summary/completion scans read only this
+            'phases': {node_name: 'Pending' for node_name in all_nodes},
             'summary': {
                 'total': len(all_nodes),
                 'completed': 0,
@@ -160,42 +182,158 @@ def create_direct_update(spec, name, namespace, status, **kwargs):
     return {'message': f'DirectUpdate {name} initialized with operation ID {operation_id}'}
 
 
-@kopf.timer(GROUP, VERSION, PLURAL, interval=30.0, sharp=True)
-def reconcile_direct_update(spec, name, status, **kwargs):
+# Reconciles for one CR can fire from several kopf workers at once —
+# the safety timer, the status.nodes field handler, and the node event
+# handler all call reconcile(). One lock per CR serializes them; an
+# overlapping call is skipped rather than queued, because its status
+# snapshot predates the in-flight reconcile's patch and acting on it
+# would redo work (e.g. re-trigger an etcd backup whose fixed-name
+# ConfigMap already exists)
+_reconcile_locks = {}
+_reconcile_locks_guard = threading.Lock()
+
+
+def _reconcile_lock(name):
+    with _reconcile_locks_guard:
+        lock = _reconcile_locks.get(name)
+        if lock is None:
+            lock = _reconcile_locks.setdefault(name, threading.Lock())
+        return lock
+
+
+def reconcile(spec, name, status):
     """
-    Reconcile DirectUpdate resources periodically
+    Reconcile a DirectUpdate resource
     This is the main control loop that drives the upgrade process
     """
     if not status:
         logger.debug(f"DirectUpdate {name} has no status yet, skipping")
         return
-    
+
+    lock = _reconcile_lock(name)
+    if not lock.acquire(blocking=False):
+        # The in-flight reconcile will patch the status, which fires
+        # the field handler and brings us back with a fresh snapshot
+        logger.debug(f"Reconcile already in flight for {name}, skipping")
+        return
+    try:
+        _reconcile(spec, name, status)
+    finally:
+        lock.release()
+
+
+def _reconcile(spec, name, status):
     phase = status.get('phase')
     operation_id = status.get('operationID')
-    
+
     # Skip if not in a phase that requires action
     if phase in ['Succeeded', 'Failed', 'Cancelled']:
         logger.debug(f"DirectUpdate {name} is in terminal phase {phase}, skipping")
         return
-    
+
     logger.debug(f"Reconciling DirectUpdate {name} (phase: {phase}, operation: {operation_id})")
-    
+
     # If Pending, run preflight checks
     if phase == 'Pending':
         handle_pending_phase(spec, name, status, operation_id)
-    
+
     # If InProgress, orchestrate upgrades
     elif phase == 'InProgress':
         handle_in_progress_phase(spec, name, status, operation_id)
-    
+
     # If RequiresAttention, log and wait for manual intervention
     elif phase == 'RequiresAttention':
         logger.warning(f"DirectUpdate {name} requires attention")
 
 
+# Adaptive safety-net polling: per-CR backoff that doubles while the
+# node statuses are unchanged and resets as soon as anything moves
+_POLL_FLOOR = 30.0
+_POLL_CEILING = 300.0
+_poll_state = {}
+
+
+@kopf.timer(GROUP, VERSION, PLURAL, interval=_POLL_FLOOR, sharp=True)
+def reconcile_direct_update(spec, name, status, **kwargs):
+    """
+    Safety-net reconcile for stuck operations
+    Normal progress is driven by the event handlers below, so this only
+    needs to catch missed events. While nothing changes between ticks
+    the effective poll interval doubles up to a cap; any observed change
+    resets it to the floor
+    """
+    now = time.monotonic()
+    nodes_hash = hash(repr((status or {}).get('nodes')))
+
+    entry = _poll_state.setdefault(name, {'hash': None, 'interval': _POLL_FLOOR, 'next_due': 0.0})
+    if nodes_hash != entry['hash']:
+        entry['hash'] = nodes_hash
+        entry['interval'] = _POLL_FLOOR
+    elif now < entry['next_due']:
+        logger.debug(f"DirectUpdate {name} unchanged, backing off safety poll")
+        return
+    else:
+        entry['interval'] = min(entry['interval'] * 2, _POLL_CEILING)
+    entry['next_due'] = now + entry['interval']
+
+    reconcile(spec, name, status)
+
+
+@kopf.on.field(GROUP, VERSION, PLURAL, field='status.nodes')
+def on_node_status_change(spec, name, status, **kwargs):
+    """React immediately when per-node status entries change"""
+    reconcile(spec, name, status)
+
+
+@kopf.on.event('', 'v1', 'nodes',
+               annotations={'cupcake.ricardomolendijk.com/status': kopf.PRESENT})
+def on_agent_node_event(annotations, **kwargs):
+    """
+    React to the upgrade agent flipping its status annotation on a node
+    by reconciling the DirectUpdate that owns the operation
+    """
+    operation_id = annotations.get('cupcake.ricardomolendijk.com/operation-id')
+    if not operation_id:
+        return
+
+    api = client.CustomObjectsApi()
+    try:
+        updates = api.list_cluster_custom_object(GROUP, VERSION, PLURAL)
+    except Exception as e:
+        logger.error(f"Failed to list DirectUpdates for node event: {e}")
+        return
+
+    for item in updates.get('items', []):
+        status = item.get('status') or {}
+        if status.get('operationID') != operation_id:
+            continue
+        reconcile(item.get('spec', {}), item['metadata']['name'], status)
+        break
+
+
+def plan_from_status(status):
+    """
+    Rebuild the plan recorded at creation time from the CR status
+    Returns None for CRs created before the plan was recorded
+    """
+    control_plane = status.get('controlPlaneNodes')
+    nodes = status.get('nodes')
+    if control_plane is None or not nodes:
+        return None
+
+    control_plane_set = set(control_plane)
+    workers = [n for n in nodes if n not in control_plane_set]
+    return {
+        'control_plane_nodes': list(control_plane),
+        'worker_nodes': workers,
+        'total': len(nodes)
+    }
+
+
 def handle_pending_phase(spec, name, status, operation_id):
     """Handle operations in Pending phase"""
     logger.info(f"Running preflight checks for {name}")
+    now_iso = datetime.now(timezone.utc).isoformat()
     
     # Run preflight checks if enabled
     if not spec.get('preflightChecks', True):
@@ -203,12 +341,16 @@ def handle_pending_phase(spec, name, status, operation_id):
         state.patch_status(GROUP, VERSION, PLURAL, name, {
             'phase': 'InProgress',
             'message': 'Preflight checks skipped, starting upgrade',
-            'lastUpdated': datetime.now(timezone.utc).isoformat()
+            'lastUpdated': now_iso
         })
         return
     
     try:
-        plan = planner.make_plan(spec)
+        # The plan was computed and stored at creation — reuse it
+        # instead of re-listing nodes on the Pending -> InProgress path
+        plan = plan_from_status(status)
+        if plan is None:
+            plan = planner.make_plan(spec)
         checks = preflight.run_preflight_checks(spec, plan)
         
         # Update status with preflight results
@@ -217,7 +359,7 @@ def handle_pending_phase(spec, name, status, operation_id):
                 'passed': checks['passed'],
                 'checks': checks['checks']
             },
-            'lastUpdated': datetime.now(timezone.utc).isoformat()
+            'lastUpdated': now_iso
         }
         
         if not checks['passed']:
@@ -236,178 +378,260 @@ def handle_pending_phase(spec, name, status, operation_id):
         state.patch_status(GROUP, VERSION, PLURAL, name, {
             'phase': 'RequiresAttention',
             'message': f'Preflight checks error: {str(e)}',
-            'lastUpdated': datetime.now(timezone.utc).isoformat()
+            'lastUpdated': now_iso
         })
 
 
+class NodeClassification(NamedTuple):
+    """Single-pass digest of per-node phases for a plan"""
+    control_plane_complete: bool
+    all_complete: bool
+    summary: dict
+
+
+def classify_nodes(plan, phases):
+    """
+    Classify all planned nodes in one pass over the phases map
+    Produces the completion flags and the summary counts that
+    handle_in_progress_phase needs, instead of three separate scans
+    """
+    control_plane = set(plan['control_plane_nodes'])
+    control_plane_complete = True
+    all_complete = True
+    total = completed = upgrading = pending = failed = 0
+
+    for node_name in plan['control_plane_nodes'] + plan['worker_nodes']:
+        total += 1
+        phase = phases.get(node_name, 'Pending')
+
+        if phase == 'Completed':
+            completed += 1
+        elif phase in _BUSY_PHASES:
+            upgrading += 1
+        elif phase == 'Pending':
+            pending += 1
+        elif phase == 'Failed':
+            failed += 1
+
+        if phase != 'Completed':
+            all_complete = False
+            if node_name in control_plane and phase not in _TERMINAL_PHASES:
+                control_plane_complete = False
+
+    summary = {
+        'total': total,
+        'completed': completed,
+        'upgrading': upgrading,
+        'pending': pending,
+        'failed': failed
+    }
+    return NodeClassification(control_plane_complete, all_complete, summary)
+
+
 def handle_in_progress_phase(spec, name, status, operation_id):
     """Handle operations in InProgress phase"""
     logger.debug(f"Processing in-progress operation {name}")
-    
+    now_iso = datetime.now(timezone.utc).isoformat()
+
     # Get current plan
     plan = planner.make_plan(spec)
-    nodes_status = status.get('nodes', {})
-    
-    # Check control-plane nodes first
-    control_plane_complete = all(
-        nodes_status.get(node, {}).get('phase') in ['Completed', 'Failed']
-        for node in plan['control_plane_nodes']
-    )
-    
-    if not control_plane_complete:
-        # Process control-plane nodes (one at a time)
-        process_control_plane_nodes(spec, name, plan, nodes_status, operation_id)
-    else:
-        # Process worker nodes (with concurrency)
-        process_worker_nodes(spec, name, plan, nodes_status, operation_id)
-    
-    # Update summary
-    update_summary(name, nodes_status)
-    
-    # Check if all nodes are complete
-    all_nodes = plan['control_plane_nodes'] + plan['worker_nodes']
-    all_complete = all(
-        nodes_status.get(node, {}).get('phase') == 'Completed'
-        for node in all_nodes
-    )
-    
-    if all_complete:
-        state.patch_status(GROUP, VERSION, PLURAL, name, {
-            'phase': 'Succeeded',
-            'message': 'All nodes upgraded successfully',
-            'completedAt': datetime.now(timezone.utc).isoformat(),
-            'lastUpdated': datetime.now(timezone.utc).isoformat()
-        })
-        logger.info(f"DirectUpdate {name} completed successfully")
+    # Prefer the compact phases map; fall back to the full node entries
+    # for CRs created before it existed
+    phases = status.get('phases')
+    if not phases:
+        phases = {n: e.get('phase', 'Pending') for n, e in status.get('nodes', {}).items()}
+    nodes = classify_nodes(plan, phases)
+
+    # Accumulate all status updates for this pass into a single PATCH
+    with state.StatusPatchBuilder(GROUP, VERSION, PLURAL, name) as patch:
+        # Check control-plane nodes first
+        if not nodes.control_plane_complete:
+            # Process control-plane nodes (one at a time)
+            process_control_plane_nodes(spec, name, plan, phases, operation_id, patch)
+        else:
+            # Process worker nodes (with concurrency)
+            process_worker_nodes(spec, name, plan, phases, operation_id, patch)
 
+        # Update summary
+        update_summary(patch, nodes.summary)
 
-def process_control_plane_nodes(spec, name, plan, nodes_status, operation_id):
+        if nodes.all_complete:
+            patch.update({
+                'phase': 'Succeeded',
+                'message': 'All nodes upgraded successfully',
+                'completedAt': now_iso,
+                'lastUpdated': now_iso
+            })
+            logger.info(f"DirectUpdate {name} completed successfully")
+
+
+def process_control_plane_nodes(spec, name, plan, phases, operation_id, patch):
     """Process control-plane nodes sequentially"""
+    now_iso = datetime.now(timezone.utc).isoformat()
     for node_name in plan['control_plane_nodes']:
-        node_phase = nodes_status.get(node_name, {}).get('phase', 'Pending')
-        
+        node_phase = phases.get(node_name, 'Pending')
+
         if node_phase == 'Pending':
             # Start upgrade for this control-plane node
             logger.info(f"Starting control-plane upgrade for node {node_name}")
-            
+
             # Trigger backup if enabled
             if backup.is_backup_enabled():
                 try:
                     logger.info(f"Taking etcd backup before upgrading {node_name}")
                     backup_result = backup.trigger_etcd_backup(node_name, operation_id)
-                    
-                    state.patch_status(GROUP, VERSION, PLURAL, name, {
+
+                    patch.update({
                         'backupInfo': backup_result,
-                        'lastUpdated': datetime.now(timezone.utc).isoformat()
+                        'lastUpdated': now_iso
                     })
                 except Exception as e:
                     logger.error(f"Backup failed for {node_name}: {e}")
-                    state.patch_status(GROUP, VERSION, PLURAL, name, {
+                    patch.update({
                         'phase': 'RequiresAttention',
                         'message': f'Backup failed for {node_name}: {str(e)}',
-                        'lastUpdated': datetime.now(timezone.utc).isoformat()
+                        'lastUpdated': now_iso
                     })
                     return
-            
+
             # Annotate node for agent pickup
             annotate_node_for_upgrade(node_name, operation_id, spec)
-            
+
             # Update node status
-            update_node_status(name, node_name, 'Upgrading', 'Control-plane upgrade initiated')
-            
+            update_node_status(patch, node_name, 'Upgrading', 'Control-plane upgrade initiated')
+
             # Only process one control-plane node at a time
             break
-        
-        elif node_phase in ['Draining', 'Upgrading', 'Verifying', 'Uncordoning']:
+
+        elif node_phase in _UPGRADING_PHASES:
             # Still in progress, wait
             logger.debug(f"Node {node_name} is in phase {node_phase}, waiting")
             break
 
 
-def process_worker_nodes(spec, name, plan, nodes_status, operation_id):
-    """Process worker nodes with configured concurrency"""
+def process_worker_nodes(spec, name, plan, phases, operation_id, patch):
+    """
+    Process worker nodes with configured concurrency
+
+    Workers are handled in cordon-first batches: every node in the
+    current batch is cordoned before any of them is drained, so evicted
+    pods cannot be rescheduled onto a peer that is about to be drained
+    """
     concurrency = spec.get('concurrency', 1)
-    
-    # Count currently upgrading workers
+    workers = plan['worker_nodes']
+    worker_phases = {node: phases.get(node, 'Pending') for node in workers}
+
+    # Count workers already past the cordon stage
     upgrading_count = sum(
-        1 for node in plan['worker_nodes']
-        if nodes_status.get(node, {}).get('phase') in ['Draining', 'Upgrading', 'Verifying', 'Uncordoning']
+        1 for phase in worker_phases.values()
+        if phase in _UPGRADING_PHASES
     )
-    
-    # Start new upgrades up to concurrency limit
-    for node_name in plan['worker_nodes']:
-        if upgrading_count >= concurrency:
+
+    # Current batch: nodes mid-cordon plus new Pending picks, up to the
+    # concurrency limit
+    batch = [n for n in workers if worker_phases[n] in _CORDON_PHASES]
+    for node_name in workers:
+        if upgrading_count + len(batch) >= concurrency:
             break
-        
-        node_phase = nodes_status.get(node_name, {}).get('phase', 'Pending')
-        
-        if node_phase == 'Pending':
+        if worker_phases[node_name] == 'Pending':
+            batch.append(node_name)
+
+    if not batch:
+        return
+
+    # Cordon the entire batch first
+    pending_cordon = [n for n in batch if worker_phases[n] == 'Pending']
+    if pending_cordon:
+        annotate_nodes_for_upgrade(pending_cordon, operation_id, spec, action='cordon')
+        for node_name in pending_cordon:
+            logger.info(f"Cordoning worker node {node_name}")
+            update_node_status(patch, node_name, 'Cordoning', 'Cordon requested')
+        # Wait for the agent to confirm the new cordons before draining
+        return
+
+    if all(worker_phases[n] == 'Cordoned' for n in batch):
+        # Entire batch is cordoned — start draining
+        annotate_nodes_for_upgrade(batch, operation_id, spec, action='drain')
+        for node_name in batch:
             logger.info(f"Starting worker upgrade for node {node_name}")
-            
-            # Annotate node for agent pickup
-            annotate_node_for_upgrade(node_name, operation_id, spec)
-            
-            # Update node status
-            update_node_status(name, node_name, 'Upgrading', 'Worker upgrade initiated')
-            
-            upgrading_count += 1
+            update_node_status(patch, node_name, 'Upgrading', 'Worker upgrade initiated')
 
 
-def annotate_node_for_upgrade(node_name, operation_id, spec):
+def annotate_nodes_for_upgrade(node_names, operation_id, spec, action='upgrade'):
+    """
+    Annotate a batch of nodes concurrently
+    Each patch_node is a blocking HTTP round-trip, so fanning the batch
+    out over the shared pool makes batch-start time ~1 RTT instead of
+    one RTT per node. Raises the first failure after all calls finish
+    """
+    if len(node_names) == 1:
+        annotate_node_for_upgrade(node_names[0], operation_id, spec, action=action)
+        return
+
+    futures = [
+        _node_api_pool.submit(annotate_node_for_upgrade, n, operation_id, spec, action=action)
+        for n in node_names
+    ]
+    for future in futures:
+        future.result()
+
+
+def annotate_node_for_upgrade(node_name, operation_id, spec, action='upgrade'):
     """Annotate node with upgrade instructions for agent"""
     try:
         v1 = client.CoreV1Api()
-        
-        # Create annotation with operation details
-        annotation_value = operation_id
-        
+
+        # Server-side apply with a fixed field manager: only the
+        # annotations listed here are owned and re-stamped, so the API
+        # server doesn't fire watch events for unchanged fields and
+        # there is no read-modify-write race with other writers
         body = {
+            "apiVersion": "v1",
+            "kind": "Node",
             "metadata": {
+                "name": node_name,
                 "annotations": {
                     "cupcake.ricardomolendijk.com/operation-id": operation_id,
                     "cupcake.ricardomolendijk.com/target-version": spec.get('targetVersion'),
                     "cupcake.ricardomolendijk.com/components": ",".join(spec.get('components', ['kubeadm', 'kubelet'])),
+                    "cupcake.ricardomolendijk.com/action": action,
                     "cupcake.ricardomolendijk.com/status": "pending"
                 }
             }
         }
-        
-        v1.patch_node(node_name, body)
+
+        v1.patch_node(
+            node_name, body,
+            field_manager='cupcake-operator',
+            force=True,
+            _content_type='application/apply-patch+yaml'
+        )
         logger.info(f"Annotated node {node_name} with operation {operation_id}")
-        
+
     except Exception as e:
         logger.error(f"Failed to annotate node {node_name}: {e}")
         raise
 
 
-def update_node_status(cr_name, node_name, phase, message):
-    """Update status for a specific node"""
-    status_update = {
+def update_node_status(patch, node_name, phase, message):
+    """Queue a status update for a specific node on the patch builder"""
+    now_iso = datetime.now(timezone.utc).isoformat()
+    patch.update({
         'nodes': {
             node_name: {
                 'phase': phase,
                 'message': message,
-                'lastUpdated': datetime.now(timezone.utc).isoformat()
+                'lastUpdated': now_iso
             }
         },
-        'lastUpdated': datetime.now(timezone.utc).isoformat()
-    }
-    
-    state.patch_status(GROUP, VERSION, PLURAL, cr_name, status_update)
+        'phases': {node_name: phase},
+        'lastUpdated': now_iso
+    })
 
 
-def update_summary(cr_name, nodes_status):
-    """Update summary counts in CR status"""
-    summary = {
-        'total': len(nodes_status),
-        'completed': sum(1 for n in nodes_status.values() if n.get('phase') == 'Completed'),
-        'upgrading': sum(1 for n in nodes_status.values() 
-                        if n.get('phase') in ['Draining', 'Upgrading', 'Verifying', 'Uncordoning']),
-        'pending': sum(1 for n in nodes_status.values() if n.get('phase') == 'Pending'),
-        'failed': sum(1 for n in nodes_status.values() if n.get('phase') == 'Failed')
-    }
-    
-    state.patch_status(GROUP, VERSION, PLURAL, cr_name, {
+def update_summary(patch, summary):
+    """Queue updated summary counts on the patch builder"""
+    patch.update({
         'summary': summary,
         'lastUpdated': datetime.now(timezone.utc).isoformat()
     })
@@ -416,5 +640,9 @@ def update_summary(cr_name, nodes_status):
 @kopf.on.delete(GROUP, VERSION, PLURAL)
 def delete_direct_update(name, **kwargs):
     """Handle DirectUpdate deletion"""
+    _poll_state.pop(name, None)
+    with _reconcile_locks_guard:
+        _reconcile_locks.pop(name, None)
+    state.forget_resource(GROUP, VERSION, PLURAL, name)
     logger.info(f"DirectUpdate {name} deleted")
     return {'message': f'DirectUpdate {name} cleanup complete'}
@@ -8,6 +8,7 @@ from datetime import datetime, timezone
 from dateutil import parser as date_parser
 
 from lib import state
+from lib.scheduler import update_scheduler
 
 logger = logging.getLogger(__name__)
 
@@ -16,49 +17,122 @@ VERSION = "v1"
 PLURAL = "scheduledupdates"
 
 
+@kopf.on.startup()
+async def start_update_scheduler(**_):
+    """Start the min-heap scheduler that executes due updates"""
+    update_scheduler.start(execute_scheduled_update)
+
+
 @kopf.on.create(GROUP, VERSION, PLURAL)
 def create_scheduled_update(spec, name, **kwargs):
     """Handle ScheduledUpdate creation"""
     logger.info(f"ScheduledUpdate {name} created")
-    
+
     schedule_at = spec.get('scheduleAt')
     if not schedule_at:
         raise kopf.PermanentError("scheduleAt is required")
-    
+
     # Parse and validate schedule time
     try:
         scheduled_time = date_parser.isoparse(schedule_at)
     except Exception as e:
         raise kopf.PermanentError(f"Invalid scheduleAt format: {e}")
-    
+
+    scheduled_epoch = int(scheduled_time.timestamp())
+
     initial_status = {
         'phase': 'Scheduled',
         'scheduledFor': schedule_at,
+        # Parsed once here so later checks don't re-parse the string
+        'scheduledEpoch': scheduled_epoch,
         'message': f'Scheduled for {schedule_at}'
     }
-    
+
     state.patch_status(GROUP, VERSION, PLURAL, name, initial_status)
-    
+    update_scheduler.schedule(scheduled_epoch, name)
+
     return {'message': f'ScheduledUpdate {name} scheduled for {schedule_at}'}
 
 
-@kopf.timer(GROUP, VERSION, PLURAL, interval=60.0)
-def check_scheduled_update(spec, name, status, **kwargs):
-    """Check if it's time to execute the scheduled update"""
+@kopf.on.update(GROUP, VERSION, PLURAL)
+def update_scheduled_update(spec, name, status, **kwargs):
+    """Re-schedule a pending update when spec.scheduleAt is edited"""
+    if not status or status.get('phase') != 'Scheduled':
+        return
+
+    schedule_at = spec.get('scheduleAt')
+    if not schedule_at:
+        raise kopf.PermanentError("scheduleAt is required")
+
+    if schedule_at == status.get('scheduledFor'):
+        # Some other spec field changed; the schedule stands
+        return
+
+    try:
+        scheduled_epoch = int(date_parser.isoparse(schedule_at).timestamp())
+    except Exception as e:
+        raise kopf.PermanentError(f"Invalid scheduleAt format: {e}")
+
+    logger.info(f"ScheduledUpdate {name} rescheduled for {schedule_at}")
+    update_scheduler.cancel(name)
+    update_scheduler.schedule(scheduled_epoch, name)
+
+    state.patch_status(GROUP, VERSION, PLURAL, name, {
+        'scheduledFor': schedule_at,
+        'scheduledEpoch': scheduled_epoch,
+        'message': f'Rescheduled for {schedule_at}'
+    })
+
+
+@kopf.on.resume(GROUP, VERSION, PLURAL)
+def resume_scheduled_update(spec, name, status, **kwargs):
+    """Re-register pending schedules after an operator restart"""
     if not status or status.get('phase') != 'Scheduled':
         return
-    
+
     schedule_at = spec.get('scheduleAt')
-    scheduled_time = date_parser.isoparse(schedule_at)
-    now = datetime.now(timezone.utc)
-    
-    if now >= scheduled_time:
-        logger.info(f"Executing scheduled update {name}")
-        # Create DirectUpdate CR
-        # Implementation would create the DirectUpdate resource here
-        
+    scheduled_epoch = status.get('scheduledEpoch')
+
+    if scheduled_epoch is None or status.get('scheduledFor') != schedule_at:
+        # Either the CR predates scheduledEpoch, or the spec was edited
+        # while the operator was down — trust the spec, not the status
+        scheduled_epoch = int(date_parser.isoparse(schedule_at).timestamp())
         state.patch_status(GROUP, VERSION, PLURAL, name, {
-            'phase': 'Executing',
-            'executedAt': now.isoformat(),
-            'message': 'DirectUpdate created'
+            'scheduledFor': schedule_at,
+            'scheduledEpoch': scheduled_epoch
         })
+
+    update_scheduler.schedule(scheduled_epoch, name)
+
+
+@kopf.on.delete(GROUP, VERSION, PLURAL)
+def delete_scheduled_update(name, **kwargs):
+    """Drop any pending schedule entry for a deleted CR"""
+    update_scheduler.cancel(name)
+
+
+def execute_scheduled_update(name):
+    """
+    Execute a due ScheduledUpdate (called by the scheduler driver)
+    Raises on API errors so the scheduler retries instead of silently
+    dropping the schedule — a transient blip at fire time must not
+    read as 'no longer Scheduled'
+    """
+    current = state.get_status_strict(GROUP, VERSION, PLURAL, name)
+    if current is None:
+        logger.info(f"ScheduledUpdate {name} no longer exists, dropping schedule")
+        return
+    if current.get('phase') != 'Scheduled':
+        logger.debug(f"ScheduledUpdate {name} no longer Scheduled, skipping")
+        return
+
+    logger.info(f"Executing scheduled update {name}")
+    # Create DirectUpdate CR
+    # Implementation would create the DirectUpdate resource here
+
+    if not state.patch_status(GROUP, VERSION, PLURAL, name, {
+        'phase': 'Executing',
+        'executedAt': datetime.now(timezone.utc).isoformat(),
+        'message': 'DirectUpdate created'
+    }):
+        raise RuntimeError(f"Failed to mark ScheduledUpdate {name} as Executing")
@@ -1,8 +1,10 @@
 """Library modules for operator functionality"""
+from . import node_cache
 from . import planner
 from . import preflight
+from . import scheduler
 from . import state
 from . import backup
 from . import version
 
-__all__ = ['planner', 'preflight', 'state', 'backup', 'version']
+__all__ = ['node_cache', 'planner', 'preflight', 'scheduler', 'state', 'backup', 'version']
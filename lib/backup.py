@@ -1,6 +1,7 @@
 """
 Backup module - Handles etcd backup operations
 """
+import functools
 import logging
 import os
 from datetime import datetime, timezone
@@ -9,15 +10,21 @@ from kubernetes import client
 logger = logging.getLogger(__name__)
 
 
+@functools.lru_cache(maxsize=1)
 def is_backup_enabled():
-    """Check if external backup store is enabled"""
+    """
+    Check if external backup store is enabled
+    Cached for the process lifetime since env vars don't change at
+    runtime; call is_backup_enabled.cache_clear() to re-read
+    """
     enabled = os.getenv('BACKUP_STORE_ENABLED', 'false').lower() == 'true'
     logger.debug(f"Backup enabled: {enabled}")
     return enabled
 
 
+@functools.lru_cache(maxsize=1)
 def get_backup_config():
-    """Get backup store configuration from environment"""
+    """Get backup store configuration from environment (cached)"""
     return {
         'enabled': is_backup_enabled(),
         'type': os.getenv('BACKUP_STORE_TYPE', 's3'),
@@ -123,18 +130,13 @@ def cleanup_backup_configmaps(operation_id):
     namespace = os.getenv('NAMESPACE', 'kube-system')
     
     try:
-        # List ConfigMaps with operation ID label
-        cms = v1.list_namespaced_config_map(
+        # Delete all matching ConfigMaps in one collection-scoped call
+        # instead of listing and deleting them one by one
+        v1.delete_collection_namespaced_config_map(
             namespace,
             label_selector=f'cupcake.ricardomolendijk.com/operation-id={operation_id},cupcake.ricardomolendijk.com/backup=true'
         )
-        
-        for cm in cms.items:
-            try:
-                v1.delete_namespaced_config_map(cm.metadata.name, namespace)
-                logger.info(f"Deleted backup ConfigMap {cm.metadata.name}")
-            except Exception as e:
-                logger.warning(f"Failed to delete ConfigMap {cm.metadata.name}: {e}")
-                
+        logger.info(f"Deleted backup ConfigMaps for operation {operation_id}")
+
     except Exception as e:
         logger.error(f"Failed to cleanup backup ConfigMaps: {e}")
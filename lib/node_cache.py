@@ -0,0 +1,96 @@
+"""
+Node cache module - Watch-backed cache of cluster nodes
+"""
+import logging
+import threading
+import time
+from kubernetes import client, watch
+
+logger = logging.getLogger(__name__)
+
+
+class NodeCache:
+    """
+    Process-wide informer-style cache of cluster nodes.
+
+    Maintains a dict of node name -> V1Node, kept up to date by a
+    long-lived watch in a background thread. Consumers read via
+    snapshot() instead of issuing their own list_node() calls.
+    """
+
+    def __init__(self):
+        self._nodes = {}
+        self._lock = threading.Lock()
+        self._started = False
+        self._thread = None
+
+    def start(self):
+        """Start the background watch thread (idempotent)"""
+        if self._started:
+            return
+        self._started = True
+        self._thread = threading.Thread(
+            target=self._run, name='node-cache-watch', daemon=True
+        )
+        self._thread.start()
+        logger.info("Node cache watch started")
+
+    @property
+    def started(self):
+        return self._started
+
+    def snapshot(self):
+        """Return a shallow copy of the current node-name -> V1Node dict"""
+        with self._lock:
+            return dict(self._nodes)
+
+    # Delay between watch restarts after a failure: doubles from 1s up
+    # to 60s, reset once a re-list succeeds
+    _BACKOFF_FLOOR = 1.0
+    _BACKOFF_CEILING = 60.0
+
+    def _run(self):
+        # Imported here: planner imports this module at load time, so a
+        # top-level import would be circular. The watch thread only
+        # starts well after both modules exist
+        from lib import planner
+
+        v1 = client.CoreV1Api()
+        backoff = self._BACKOFF_FLOOR
+
+        while True:
+            try:
+                # Prime the cache with a full list, then watch from its
+                # resourceVersion so we never miss events between the two.
+                node_list = v1.list_node()
+                with self._lock:
+                    self._nodes = {n.metadata.name: n for n in node_list.items}
+                resource_version = node_list.metadata.resource_version
+                backoff = self._BACKOFF_FLOOR
+                # The re-list may have picked up membership changes that
+                # happened while the watch was down
+                planner.invalidate_plan_cache()
+
+                w = watch.Watch()
+                for event in w.stream(v1.list_node, resource_version=resource_version):
+                    node = event['object']
+                    with self._lock:
+                        if event['type'] == 'DELETED':
+                            self._nodes.pop(node.metadata.name, None)
+                        else:
+                            self._nodes[node.metadata.name] = node
+                    if event['type'] in ('ADDED', 'DELETED'):
+                        # Node set changed — cached plans are stale
+                        planner.invalidate_plan_cache()
+
+            except Exception as e:
+                # Back off before re-listing so a persistently failing
+                # API server (down, missing RBAC) isn't hammered in a
+                # hot loop by the very cache meant to offload it
+                logger.warning(f"Node watch interrupted, restarting in {backoff:.0f}s: {e}")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, self._BACKOFF_CEILING)
+
+
+# Module-level singleton shared by planner and handlers
+node_cache = NodeCache()
@@ -1,11 +1,45 @@
 """
 Planner module - Computes upgrade plans from specs
 """
+import json
 import logging
+import time
 from kubernetes import client
 
+from lib.node_cache import node_cache
+
 logger = logging.getLogger(__name__)
 
+# Cache computed plans keyed on the spec fields that affect planning.
+# The reconcile timer calls make_plan on every tick; without this cache
+# each tick issues a full list_node() against the API server.
+_PLAN_CACHE = {}
+_PLAN_CACHE_TTL = 10.0
+
+
+def _plan_cache_key(spec):
+    """Build a cache key from the spec fields that influence the plan"""
+    relevant = {
+        'nodeSelector': spec.get('nodeSelector', {}),
+        'canary': spec.get('canary', {})
+    }
+    return json.dumps(relevant, sort_keys=True)
+
+
+def invalidate_plan_cache():
+    """Drop all cached plans (e.g. when the node set changes)"""
+    _PLAN_CACHE.clear()
+
+
+def _list_nodes():
+    """
+    List cluster nodes, preferring the shared watch-backed cache
+    over a direct list_node() API call
+    """
+    if node_cache.started:
+        return list(node_cache.snapshot().values())
+    return client.CoreV1Api().list_node().items
+
 
 def make_plan(spec):
     """
@@ -14,36 +48,50 @@ def make_plan(spec):
       - control_plane_nodes: list of control plane node names
       - worker_nodes: list of worker node names
       - total: total number of nodes
+
+    Results are cached for a short TTL so repeated reconcile ticks
+    don't re-list nodes from the API server.
     """
-    v1 = client.CoreV1Api()
-    
+    cache_key = _plan_cache_key(spec)
+    cached = _PLAN_CACHE.get(cache_key)
+    if cached is not None:
+        cached_at, cached_plan = cached
+        if time.monotonic() - cached_at < _PLAN_CACHE_TTL:
+            logger.debug("Returning cached plan")
+            return cached_plan
+        del _PLAN_CACHE[cache_key]
+
     try:
-        nodes = v1.list_node().items
+        nodes = _list_nodes()
     except Exception as e:
         logger.error(f"Failed to list nodes: {e}")
         raise
     
     control_plane = []
     workers = []
-    
+
+    # Hoist the selector out of the loop: the common no-selector case
+    # skips the per-node filter entirely
+    node_selector = spec.get('nodeSelector') or None
+    selector_items = tuple(node_selector.items()) if node_selector else ()
+
     for node in nodes:
         labels = node.metadata.labels or {}
         node_name = node.metadata.name
-        
+
         # Check if control-plane node
         is_control_plane = (
             labels.get("node-role.kubernetes.io/control-plane") is not None or
             labels.get("node-role.kubernetes.io/master") is not None
         )
-        
+
         # Apply node selector filter if specified
-        node_selector = spec.get('nodeSelector', {})
-        if node_selector:
-            matches = all(labels.get(k) == v for k, v in node_selector.items())
+        if selector_items:
+            matches = all(labels.get(k) == v for k, v in selector_items)
             if not matches:
                 logger.debug(f"Node {node_name} excluded by nodeSelector")
                 continue
-        
+
         if is_control_plane:
             control_plane.append(node_name)
         else:
@@ -51,37 +99,24 @@ def make_plan(spec):
     
     # Handle canary nodes if specified
     canary_config = spec.get('canary', {})
-    if not canary_config.get('enabled', False):
-        plan = {
-            'control_plane_nodes': control_plane,
-            'worker_nodes': workers,
-            'total': len(control_plane) + len(workers)
-        }
-        logger.info(f"Plan: {len(control_plane)} control-plane, {len(workers)} workers")
-        return plan
-    
     canary_nodes = canary_config.get('nodes', [])
-    if not canary_nodes:
-        plan = {
-            'control_plane_nodes': control_plane,
-            'worker_nodes': workers,
-            'total': len(control_plane) + len(workers)
-        }
-        logger.info(f"Plan: {len(control_plane)} control-plane, {len(workers)} workers")
-        return plan
-    
-    # Move canary nodes to front of worker list
-    canary_in_workers = [n for n in canary_nodes if n in workers]
-    non_canary_workers = [n for n in workers if n not in canary_nodes]
-    workers = canary_in_workers + non_canary_workers
-    logger.info(f"Canary enabled with {len(canary_in_workers)} canary nodes")
-    
+    if canary_config.get('enabled', False) and canary_nodes:
+        # Move canary nodes to front of worker list; use sets for the
+        # membership tests so this stays O(workers + canary)
+        canary_set = set(canary_nodes)
+        workers_set = set(workers)
+        canary_in_workers = [n for n in canary_nodes if n in workers_set]
+        non_canary_workers = [n for n in workers if n not in canary_set]
+        workers = canary_in_workers + non_canary_workers
+        logger.info(f"Canary enabled with {len(canary_in_workers)} canary nodes")
+
     plan = {
         'control_plane_nodes': control_plane,
         'worker_nodes': workers,
         'total': len(control_plane) + len(workers)
     }
-    
+
+    _PLAN_CACHE[cache_key] = (time.monotonic(), plan)
     logger.info(f"Plan: {len(control_plane)} control-plane, {len(workers)} workers")
     return plan
 
@@ -2,10 +2,58 @@
 Preflight checks module - Validates cluster state before upgrade
 """
 import logging
+import orjson
 from kubernetes import client
 
 logger = logging.getLogger(__name__)
 
+# Lazily-initialized API clients shared across calls; each constructor
+# walks the client configuration and allocates a connection pool, which
+# is wasted work on a per-check basis. First use happens after the
+# Kubernetes config is loaded at startup
+_core_v1 = None
+_policy_v1 = None
+
+
+def _core_api():
+    global _core_v1
+    if _core_v1 is None:
+        _core_v1 = client.CoreV1Api()
+    return _core_v1
+
+
+def _policy_api():
+    global _policy_v1
+    if _policy_v1 is None:
+        _policy_v1 = client.PolicyV1Api()
+    return _policy_v1
+
+
+def _load_nodes_once(node_names):
+    """
+    Load all named nodes with a single list_node() call instead of one
+    GET per node
+    Returns (nodes, error): a dict of node name -> node dict, and the
+    exception if the list call itself failed. Nodes missing from the
+    cluster map to a KeyError so checks can fail them explicitly
+    """
+    v1 = _core_api()
+    wanted = set(node_names)
+
+    try:
+        # Skip the swagger model deserialization: the checks only read a
+        # couple of fields, so parse the raw response as plain dicts
+        response = v1.list_node(_preload_content=False)
+        items = orjson.loads(response.data)['items']
+    except Exception as e:
+        logger.error(f"Failed to list nodes: {e}")
+        return {}, e
+
+    nodes = {n['metadata']['name']: n for n in items if n['metadata']['name'] in wanted}
+    for name in wanted - nodes.keys():
+        nodes[name] = KeyError(f'node {name} not found in cluster')
+    return nodes, None
+
 
 def run_preflight_checks(spec, plan):
     """
@@ -14,160 +62,198 @@ def run_preflight_checks(spec, plan):
       - passed: boolean indicating if all checks passed
       - checks: list of check results
     """
-    checks = []
-    all_passed = True
-    
-    # Check 1: API server reachability
-    check_result = check_api_server()
-    checks.append(check_result)
-    if not check_result['passed']:
-        all_passed = False
-    
-    # Check 2: Node readiness
-    check_result = check_nodes_ready(plan)
-    checks.append(check_result)
-    if not check_result['passed']:
-        all_passed = False
-    
-    # Check 3: Disk space on nodes
-    check_result = check_disk_space(plan)
-    checks.append(check_result)
-    if not check_result['passed']:
-        all_passed = False
-    
-    # Check 4: PodDisruptionBudgets
-    check_result = check_pdbs()
-    checks.append(check_result)
-    if not check_result['passed']:
-        all_passed = False
-    
-    # Check 5: Air-gapped bundle (if enabled)
+    # Fetch all planned nodes once; this single list call doubles as
+    # the API-server connectivity probe, and the readiness and disk
+    # checks both run against the snapshot
+    nodes, list_error = _load_nodes_once(plan['control_plane_nodes'] + plan['worker_nodes'])
+
+    api_check = check_api_server(list_error)
+    if not api_check['passed']:
+        # No point running node checks against a snapshot we never got
+        return {
+            'passed': False,
+            'checks': [api_check]
+        }
+
+    check_fns = [
+        lambda: check_nodes_ready(nodes),
+        lambda: check_disk_space(nodes),
+        check_pdbs
+    ]
     if spec.get('airGapped', {}).get('enabled', False):
-        check_result = check_airgap_bundle(spec)
-        checks.append(check_result)
-        if not check_result['passed']:
-            all_passed = False
-    
+        check_fns.append(lambda: check_airgap_bundle(spec))
+
+    checks = [api_check] + [fn() for fn in check_fns]
+
     return {
-        'passed': all_passed,
+        'passed': all(check['passed'] for check in checks),
         'checks': checks
     }
 
 
-def check_api_server():
-    """Check if API server is reachable"""
-    try:
-        v1 = client.CoreV1Api()
-        # Simple API call to verify connectivity
-        v1.get_api_resources()
-        
-        return {
-            'name': 'API Server Connectivity',
-            'passed': True,
-            'message': 'API server is reachable'
-        }
-    except Exception as e:
-        logger.error(f"API server check failed: {e}")
+def check_api_server(list_error=None):
+    """
+    Report API server reachability based on the node-list call that
+    already ran — no extra round-trip needed
+    """
+    if list_error is not None:
+        logger.error(f"API server check failed: {list_error}")
         return {
             'name': 'API Server Connectivity',
             'passed': False,
-            'message': f'API server unreachable: {str(e)}'
+            'message': f'API server unreachable: {str(list_error)}'
         }
 
+    return {
+        'name': 'API Server Connectivity',
+        'passed': True,
+        'message': 'API server is reachable'
+    }
+
 
-def check_nodes_ready(plan):
-    """Check if all nodes are in Ready state"""
-    v1 = client.CoreV1Api()
-    all_nodes = plan['control_plane_nodes'] + plan['worker_nodes']
+def check_nodes_ready(nodes, strict=False):
+    """
+    Check if all fetched nodes are in Ready state
+    With strict=True the check returns on the first failing node
+    instead of collecting them all — cheaper when the caller only
+    needs a pass/fail answer
+    """
     not_ready = []
-    
-    try:
-        for node_name in all_nodes:
-            node = v1.read_node(node_name)
-            
-            # Check node conditions
-            is_ready = False
-            for condition in node.status.conditions:
-                if condition.type == 'Ready' and condition.status == 'True':
-                    is_ready = True
-                    break
-            
-            if not is_ready:
-                not_ready.append(node_name)
-        
-        if not_ready:
-            return {
-                'name': 'Node Readiness',
-                'passed': False,
-                'message': f'Nodes not ready: {", ".join(not_ready)}'
-            }
-        
+    unreachable = []
+
+    for node_name, node in nodes.items():
+        if isinstance(node, Exception):
+            if strict:
+                logger.error(f"Node readiness check failed for: {node_name}")
+                return {
+                    'name': 'Node Readiness',
+                    'passed': False,
+                    'message': f'Failed to check node readiness: {node_name}'
+                }
+            unreachable.append(node_name)
+            continue
+
+        # Map condition type -> status for O(1) lookups
+        conditions = {c['type']: c['status'] for c in node['status'].get('conditions') or []}
+
+        if conditions.get('Ready') != 'True':
+            if strict:
+                return {
+                    'name': 'Node Readiness',
+                    'passed': False,
+                    'message': f'Nodes not ready: {node_name}'
+                }
+            not_ready.append(node_name)
+
+    if unreachable:
+        logger.error(f"Node readiness check failed for: {', '.join(unreachable)}")
         return {
             'name': 'Node Readiness',
-            'passed': True,
-            'message': f'All {len(all_nodes)} nodes are ready'
+            'passed': False,
+            'message': f'Failed to check node readiness: {", ".join(unreachable)}'
         }
-    
-    except Exception as e:
-        logger.error(f"Node readiness check failed: {e}")
+
+    if not_ready:
         return {
             'name': 'Node Readiness',
             'passed': False,
-            'message': f'Failed to check node readiness: {str(e)}'
+            'message': f'Nodes not ready: {", ".join(not_ready)}'
         }
 
+    return {
+        'name': 'Node Readiness',
+        'passed': True,
+        'message': f'All {len(nodes)} nodes are ready'
+    }
 
-def check_disk_space(plan):
-    """Check disk space on nodes (basic check via node status)"""
-    v1 = client.CoreV1Api()
-    all_nodes = plan['control_plane_nodes'] + plan['worker_nodes']
+
+def check_disk_space(nodes):
+    """Check disk space on fetched nodes (basic check via node status)"""
     low_disk = []
-    
-    try:
-        for node_name in all_nodes:
-            node = v1.read_node(node_name)
-            
-            # Check for DiskPressure condition
-            for condition in node.status.conditions:
-                if condition.type == 'DiskPressure' and condition.status == 'True':
-                    low_disk.append(node_name)
-                    break
-        
-        if low_disk:
-            return {
-                'name': 'Disk Space',
-                'passed': False,
-                'message': f'Nodes with disk pressure: {", ".join(low_disk)}'
-            }
-        
+    unreachable = []
+
+    for node_name, node in nodes.items():
+        if isinstance(node, Exception):
+            unreachable.append(node_name)
+            continue
+
+        # Map condition type -> status for O(1) lookups
+        conditions = {c['type']: c['status'] for c in node['status'].get('conditions') or []}
+
+        if conditions.get('DiskPressure') == 'True':
+            low_disk.append(node_name)
+
+    if unreachable:
+        logger.error(f"Disk space check failed for: {', '.join(unreachable)}")
         return {
             'name': 'Disk Space',
-            'passed': True,
-            'message': f'All nodes have sufficient disk space'
+            'passed': False,
+            'message': f'Failed to check disk space: {", ".join(unreachable)}'
         }
-    
-    except Exception as e:
-        logger.error(f"Disk space check failed: {e}")
+
+    if low_disk:
         return {
             'name': 'Disk Space',
             'passed': False,
-            'message': f'Failed to check disk space: {str(e)}'
+            'message': f'Nodes with disk pressure: {", ".join(low_disk)}'
         }
 
+    return {
+        'name': 'Disk Space',
+        'passed': True,
+        'message': f'All nodes have sufficient disk space'
+    }
+
+
+def _list_restrictive_pdbs():
+    """
+    Page through PDBs (200 at a time) collecting those with zero
+    disruptions allowed. Server-side filtering on
+    status.disruptionsAllowed is attempted first; most API servers
+    reject field selectors on PDB status, in which case we fall back
+    to client-side filtering. Stops early once more than 10
+    restrictive PDBs are found — the check only reports a count and
+    the first few names
+    """
+    policy_v1 = _policy_api()
+    restrictive_pdbs = []
+    use_field_selector = True
+    continue_token = None
+
+    while True:
+        # Raw response + orjson: PDB lists can be large and we only
+        # read the name, namespace, and disruptionsAllowed fields
+        kwargs = {'limit': 200, '_preload_content': False}
+        if continue_token:
+            kwargs['_continue'] = continue_token
+        if use_field_selector:
+            kwargs['field_selector'] = 'status.disruptionsAllowed=0'
+
+        try:
+            response = policy_v1.list_pod_disruption_budget_for_all_namespaces(**kwargs)
+        except client.exceptions.ApiException:
+            if use_field_selector and continue_token is None:
+                use_field_selector = False
+                continue
+            raise
+
+        body = orjson.loads(response.data)
+        for pdb in body.get('items', []):
+            if pdb.get('status', {}).get('disruptionsAllowed') == 0:
+                restrictive_pdbs.append(f"{pdb['metadata']['namespace']}/{pdb['metadata']['name']}")
+
+        continue_token = body.get('metadata', {}).get('continue')
+        if not continue_token or len(restrictive_pdbs) > 10:
+            break
+
+    return restrictive_pdbs
+
 
 def check_pdbs():
     """Check PodDisruptionBudgets to identify potential drain issues"""
-    policy_v1 = client.PolicyV1Api()
-    
     try:
-        pdbs = policy_v1.list_pod_disruption_budget_for_all_namespaces()
-        
-        restrictive_pdbs = []
-        for pdb in pdbs.items:
-            # Check if PDB is very restrictive
-            if pdb.status.disruptions_allowed == 0:
-                restrictive_pdbs.append(f"{pdb.metadata.namespace}/{pdb.metadata.name}")
-        
+        restrictive_pdbs = _list_restrictive_pdbs()
+
         if not restrictive_pdbs:
             return {
                 'name': 'PodDisruptionBudgets',
@@ -192,7 +278,7 @@ def check_pdbs():
 
 def check_airgap_bundle(spec):
     """Check if air-gapped bundle ConfigMap exists"""
-    v1 = client.CoreV1Api()
+    v1 = _core_api()
     bundle_cm = spec.get('airGapped', {}).get('bundleConfigMap')
     
     if not bundle_cm:
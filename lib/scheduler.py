@@ -0,0 +1,100 @@
+"""
+Scheduler module - Min-heap driver for ScheduledUpdate execution
+"""
+import asyncio
+import heapq
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on how long the driver sleeps when nothing is due soon
+_MAX_SLEEP = 3600.0
+
+# Delay before re-attempting a due entry whose callback raised
+_RETRY_DELAY = 60.0
+
+
+class UpdateScheduler:
+    """
+    Single-task scheduler that fires a callback when scheduled updates
+    come due.
+
+    Instead of waking up for every CR on a fixed interval, due times are
+    kept in a min-heap and one asyncio task sleeps until the earliest
+    entry fires (or until a new, earlier entry is pushed).
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._entries = set()
+        self._loop = None
+        self._wakeup = None
+        self._task = None
+        self._callback = None
+
+    def start(self, callback):
+        """
+        Start the driver task on the running event loop (idempotent)
+        callback(name) is invoked once per due ScheduledUpdate
+        """
+        if self._task is not None:
+            return
+        self._callback = callback
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = self._loop.create_task(self._run())
+        logger.info("Update scheduler started")
+
+    def schedule(self, epoch, name):
+        """Register a ScheduledUpdate to fire at the given epoch seconds"""
+        entry = (epoch, name)
+        if entry in self._entries:
+            return
+        self._entries.add(entry)
+        heapq.heappush(self._heap, entry)
+        logger.debug(f"Scheduled {name} for epoch {epoch}")
+        if self._loop is not None:
+            # Handlers run in worker threads, so poke the loop safely
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def cancel(self, name):
+        """Drop all pending entries for a CR (lazy removal from the heap)"""
+        self._entries = {e for e in self._entries if e[1] != name}
+
+    async def _run(self):
+        while True:
+            now = time.time()
+
+            while self._heap and self._heap[0][0] <= now:
+                entry = heapq.heappop(self._heap)
+                if entry not in self._entries:
+                    # Cancelled while waiting
+                    continue
+                self._entries.discard(entry)
+                try:
+                    await asyncio.to_thread(self._callback, entry[1])
+                except Exception as e:
+                    # A raising callback means a transient failure, not
+                    # a consumed schedule — re-push it so the update is
+                    # not silently dropped until an operator restart
+                    logger.error(
+                        f"Scheduled execution of {entry[1]} failed, "
+                        f"retrying in {int(_RETRY_DELAY)}s: {e}"
+                    )
+                    self.schedule(time.time() + _RETRY_DELAY, entry[1])
+
+            if self._heap:
+                delay = min(self._heap[0][0] - time.time(), _MAX_SLEEP)
+            else:
+                delay = _MAX_SLEEP
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(delay, 0.1))
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+
+# Module-level singleton driven from the ScheduledUpdate handlers
+update_scheduler = UpdateScheduler()
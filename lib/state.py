@@ -2,39 +2,78 @@
 State management module - Handles CR status updates
 """
 import logging
+import threading
+import time
+from datetime import datetime, timezone
 from kubernetes import client
-import copy
 
 logger = logging.getLogger(__name__)
 
+# Lazily-initialized CustomObjectsApi shared by all status operations;
+# constructed on first use, after the Kubernetes config is loaded
+_custom_objects = None
+
+
+def _custom_objects_api():
+    global _custom_objects
+    if _custom_objects is None:
+        _custom_objects = client.CustomObjectsApi()
+    return _custom_objects
+
+# Last patch sent per resource (timestamps stripped), used to skip
+# PATCHes that would not change anything semantically
+_last_sent_patches = {}
+
+
+def _strip_timestamps(value):
+    """Recursively drop lastUpdated keys so patches compare semantically"""
+    if not isinstance(value, dict):
+        return value
+    return {k: _strip_timestamps(v) for k, v in value.items() if k != 'lastUpdated'}
+
 
 def patch_status(group, version, plural, name, status_patch):
     """
     Patch the status of a custom resource
-    Uses strategic merge patch to avoid overwriting other fields
+    Sends the patch as a JSON merge patch so the API server merges it
+    into the existing status — no GET round-trip or Python-side deep
+    merge is needed (the client sends dict bodies as merge-patch)
+
+    Patches that only re-stamp timestamps, or that are identical to the
+    last patch sent for this resource, are skipped entirely — otherwise
+    every reconcile tick fires a watch event and re-triggers itself.
     """
-    api = client.CustomObjectsApi()
-    
+    resource_key = (group, version, plural, name)
+    semantic_patch = _strip_timestamps(status_patch)
+
+    if not semantic_patch:
+        logger.debug("Skipping timestamp-only status patch for %s/%s", plural, name)
+        return True
+
+    if semantic_patch == _last_sent_patches.get(resource_key):
+        logger.debug("Skipping unchanged status patch for %s/%s", plural, name)
+        return True
+
+    api = _custom_objects_api()
+
     try:
-        # Get current resource to merge status
-        current = api.get_cluster_custom_object_status(group, version, plural, name)
-        current_status = current.get('status', {})
-        
-        # Deep merge status_patch into current_status
-        merged_status = deep_merge(current_status, status_patch)
-        
-        # Patch with merged status
-        body = {'status': merged_status}
+        # Note: the request body is serialized with stdlib json inside
+        # the generated client's rest layer; pre-encoding it here (e.g.
+        # with orjson) gets double-serialized, so the dict goes through
+        # as-is. orjson is still used where it pays off: parsing large
+        # list responses
         api.patch_cluster_custom_object_status(
-            group, version, plural, name, body
+            group, version, plural, name, {'status': status_patch}
         )
-        
-        logger.debug(f"Patched status for {plural}/{name}")
+
+        _last_sent_patches[resource_key] = semantic_patch
+        logger.debug("Patched status for %s/%s", plural, name)
         return True
         
     except client.exceptions.ApiException as e:
         if e.status == 404:
             logger.error(f"Resource {plural}/{name} not found")
+            _last_sent_patches.pop(resource_key, None)
             return False
         
         logger.error(f"Failed to patch status for {plural}/{name}: {e}")
@@ -44,25 +83,128 @@ def patch_status(group, version, plural, name, status_patch):
         return False
 
 
+def forget_resource(group, version, plural, name):
+    """
+    Drop the patch-dedup cache entry for a resource
+    Called on CR deletion — a recreated CR under the same name starts
+    from an empty status, so its first patches can be byte-identical
+    to ones already sent to the old incarnation and must not be
+    skipped as unchanged
+    """
+    _last_sent_patches.pop((group, version, plural, name), None)
+
+
+class StatusPatchBuilder:
+    """
+    Accumulates status updates for a single CR and flushes them as one
+    patch_status call, instead of one PATCH round-trip per update.
+
+    Use as a context manager:
+        with StatusPatchBuilder(group, version, plural, name) as patch:
+            patch.update({'phase': 'InProgress'})
+            patch.update({'nodes': {node_name: {...}}})
+    """
+
+    def __init__(self, group, version, plural, name):
+        self.group = group
+        self.version = version
+        self.plural = plural
+        self.name = name
+        self._pending = {}
+
+    def update(self, status_patch):
+        """Deep-merge a status patch into the pending update"""
+        self._pending = deep_merge(self._pending, status_patch)
+
+    def flush(self):
+        """Send the accumulated patch, if any"""
+        if not self._pending:
+            return True
+        pending, self._pending = self._pending, {}
+        return patch_status(self.group, self.version, self.plural, self.name, pending)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+        return False
+
+
+class StatusBatcher:
+    """
+    Coalesces status patches across resources and flushes them from a
+    background thread every ~500ms, one patch_status call per CR.
+
+    Rapid per-node phase changes (a 50-node rollout can emit several
+    per second) collapse into a single PATCH per flush window instead
+    of one API round-trip each. Later updates to the same node within
+    a window win, which matches what the API server would have stored
+    anyway.
+    """
+
+    def __init__(self, flush_interval=0.5):
+        self._interval = flush_interval
+        self._lock = threading.Lock()
+        self._pending = {}  # (group, version, plural, name) -> status patch
+        self._thread = None
+
+    def add(self, group, version, plural, name, status_patch):
+        """Queue a status patch; starts the flush thread on first use"""
+        with self._lock:
+            key = (group, version, plural, name)
+            self._pending[key] = deep_merge(self._pending.get(key, {}), status_patch)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='status-batcher', daemon=True
+                )
+                self._thread.start()
+
+    def flush(self):
+        """Synchronously send all pending patches"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+
+        for (group, version, plural, name), status_patch in pending.items():
+            patch_status(group, version, plural, name, status_patch)
+
+    def _run(self):
+        while True:
+            time.sleep(self._interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Status batcher flush failed: {e}")
+
+
+# Shared batcher; flushed synchronously from the operator's cleanup
+# hook so no updates are lost on shutdown
+status_batcher = StatusBatcher()
+
+
 def deep_merge(base, updates):
     """
     Deep merge two dictionaries
     Updates values in base with values from updates, recursively
+
+    Only the dict levels actually descended into are copied; leaf
+    values are shared by reference, which is safe because callers never
+    mutate merged results in place
     """
-    result = copy.deepcopy(base)
-    
+    result = dict(base)
+
     for key, value in updates.items():
-        if key in result and isinstance(result[key], dict) and isinstance(value, dict):
+        if isinstance(value, dict) and isinstance(result.get(key), dict):
             result[key] = deep_merge(result[key], value)
         else:
             result[key] = value
-    
+
     return result
 
 
 def get_status(group, version, plural, name):
     """Get the current status of a custom resource"""
-    api = client.CustomObjectsApi()
+    api = _custom_objects_api()
     
     try:
         resource = api.get_cluster_custom_object_status(group, version, plural, name)
@@ -72,40 +214,80 @@ def get_status(group, version, plural, name):
         return {}
 
 
+def get_status_strict(group, version, plural, name):
+    """
+    Get the current status of a custom resource, raising on API errors
+    Returns None when the resource itself is gone (404). Callers that
+    must tell 'could not read the status' apart from 'status really is
+    empty' use this instead of get_status, which swallows every error
+    into {}
+    """
+    api = _custom_objects_api()
+
+    try:
+        resource = api.get_cluster_custom_object_status(group, version, plural, name)
+    except client.exceptions.ApiException as e:
+        if e.status == 404:
+            return None
+        raise
+
+    return resource.get('status', {})
+
+
 def update_node_phase(group, version, plural, cr_name, node_name, phase, message=''):
-    """Helper to update a specific node's phase in the CR status"""
-    from datetime import datetime, timezone
-    
+    """
+    Helper to update a specific node's phase in the CR status
+    Queued on the shared batcher rather than patched immediately
+    """
+    now_iso = datetime.now(timezone.utc).isoformat()
+
     status_patch = {
         'nodes': {
             node_name: {
                 'phase': phase,
                 'message': message,
-                'lastUpdated': datetime.now(timezone.utc).isoformat()
+                'lastUpdated': now_iso
             }
         },
-        'lastUpdated': datetime.now(timezone.utc).isoformat()
+        # Keep the compact node -> phase map in step with the full
+        # entries; the reconcile hot path reads only this
+        'phases': {node_name: phase},
+        'lastUpdated': now_iso
     }
-    
-    return patch_status(group, version, plural, cr_name, status_patch)
+
+    status_batcher.add(group, version, plural, cr_name, status_patch)
+    return True
+
+
+# Phases that count as "upgrading" in the status summary. Cordoning
+# and Cordoned are in flight too — without them cordon-phase nodes
+# fall into no bucket and the counts stop summing to total. The
+# direct_update handler aliases this set as its _BUSY_PHASES so the
+# two tallies cannot drift apart
+_UPGRADING_PHASES = frozenset({
+    'Cordoning', 'Cordoned', 'Draining', 'Upgrading', 'Verifying', 'Uncordoning'
+})
 
 
 def compute_summary(nodes_status):
-    """Compute summary statistics from node statuses"""
-    if not nodes_status:
-        return {
-            'total': 0,
-            'completed': 0,
-            'upgrading': 0,
-            'pending': 0,
-            'failed': 0
-        }
-    
+    """Compute summary statistics from node statuses in a single pass"""
+    completed = upgrading = pending = failed = 0
+
+    for n in nodes_status.values():
+        phase = n.get('phase')
+        if phase == 'Completed':
+            completed += 1
+        elif phase in _UPGRADING_PHASES:
+            upgrading += 1
+        elif phase == 'Pending':
+            pending += 1
+        elif phase == 'Failed':
+            failed += 1
+
     return {
         'total': len(nodes_status),
-        'completed': sum(1 for n in nodes_status.values() if n.get('phase') == 'Completed'),
-        'upgrading': sum(1 for n in nodes_status.values() 
-                        if n.get('phase') in ['Draining', 'Upgrading', 'Verifying', 'Uncordoning']),
-        'pending': sum(1 for n in nodes_status.values() if n.get('phase') == 'Pending'),
-        'failed': sum(1 for n in nodes_status.values() if n.get('phase') == 'Failed')
+        'completed': completed,
+        'upgrading': upgrading,
+        'pending': pending,
+        'failed': failed
     }
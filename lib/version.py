@@ -1,65 +1,72 @@
 """
 Version management module - Handles Kubernetes version validation and upgrade paths
 """
+import functools
 import logging
 import re
+import time
 import urllib.request
-from typing import List, Tuple, Optional
+from typing import List, NamedTuple, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
+# Compiled once at import; parse() is called for every CR spec and
+# cluster-version lookup
+_VERSION_RE = re.compile(r'^v?(\d+)\.(\d+)(?:\.(\d+))?$')
 
-class Version:
-    """Represents a Kubernetes version"""
-    
-    def __init__(self, version_string: str):
+
+class Version(NamedTuple):
+    """
+    Represents a Kubernetes version
+
+    A NamedTuple so instances are immutable and hashable, comparisons
+    are native tuple comparisons, and no per-instance __dict__ is
+    allocated
+    """
+    major: int
+    minor: int
+    patch: int = 0
+
+    @classmethod
+    def parse(cls, version_string: str) -> 'Version':
         """
         Parse a Kubernetes version string
         Accepts: "1.27.4", "v1.27.4", "1.27"
         """
-        # Remove 'v' prefix if present
-        version_string = version_string.lstrip('v')
-        
-        # Parse version components
-        parts = version_string.split('.')
-        
-        if len(parts) < 2:
+        match = _VERSION_RE.match(version_string)
+
+        if not match:
             raise ValueError(f"Invalid version format: {version_string}")
-        
-        self.major = int(parts[0])
-        self.minor = int(parts[1])
-        self.patch = int(parts[2]) if len(parts) > 2 else 0
-        
+
+        major, minor, patch = match.groups()
+        return cls(int(major), int(minor), int(patch) if patch else 0)
+
     def __str__(self):
         return f"{self.major}.{self.minor}.{self.patch}"
-    
+
     def __repr__(self):
         return f"Version({self})"
-    
-    def __eq__(self, other):
-        return (self.major, self.minor, self.patch) == (other.major, other.minor, other.patch)
-    
-    def __lt__(self, other):
-        return (self.major, self.minor, self.patch) < (other.major, other.minor, other.patch)
-    
-    def __le__(self, other):
-        return self < other or self == other
-    
-    def __gt__(self, other):
-        return not self <= other
-    
-    def __ge__(self, other):
-        return not self < other
-    
+
     def minor_version(self) -> str:
         """Return minor version string (e.g., '1.27')"""
         return f"{self.major}.{self.minor}"
-    
+
     def full_version(self) -> str:
         """Return full version string with patch"""
         return str(self)
 
 
+@functools.lru_cache(maxsize=256)
+def parse_version(version_string: str) -> Version:
+    """
+    Parse a version string, caching the result per string
+    The same handful of strings (CR specs, the cluster git_version)
+    are parsed on every reconcile; Version is immutable, so sharing
+    cached instances across callers is safe
+    """
+    return Version.parse(version_string)
+
+
 def get_current_cluster_version() -> Optional[Version]:
     """
     Get the current cluster version by querying the API server
@@ -72,13 +79,14 @@ def get_current_cluster_version() -> Optional[Version]:
         
         # version_info.git_version is like "v1.27.4"
         version_str = version_info.git_version
-        return Version(version_str)
+        return parse_version(version_str)
     except Exception as e:
         logger.error(f"Failed to get cluster version: {e}")
         return None
 
 
-def calculate_upgrade_path(current: Version, target: Version) -> List[Version]:
+@functools.lru_cache(maxsize=256)
+def calculate_upgrade_path(current: Version, target: Version) -> Tuple[Version, ...]:
     """
     Calculate the upgrade path from current to target version.
     
@@ -87,60 +95,72 @@ def calculate_upgrade_path(current: Version, target: Version) -> List[Version]:
     - Can skip patch versions within same minor (1.27.1 → 1.27.9)
     - CANNOT skip minor versions (1.27 → 1.29 requires 1.27 → 1.28 → 1.29)
     
-    Returns list of versions to upgrade through, including target
+    Returns a tuple of versions to upgrade through, including target.
+    Results are cached per (current, target) pair — common in fleet
+    rollouts where many CRs aim at the same versions. The returned
+    tuple is the cached object itself, shared across callers; it and
+    the Versions in it are immutable, so never copy-and-mutate it —
+    build a new tuple instead
     """
     if current >= target:
         logger.warning(f"Current version {current} is already >= target {target}")
-        return []
-    
-    path = []
+        return ()
     
     # If same minor version, jump directly to target (patch upgrade)
     if current.minor == target.minor:
         logger.info(f"Patch version upgrade: {current} → {target}")
-        path.append(target)
-        return path
-    
-    # Calculate minor version steps
+        return (target,)
+
     minor_diff = target.minor - current.minor
-    
+
     if minor_diff == 1:
-        # Direct minor version upgrade
         logger.info(f"Single minor version upgrade: {current} → {target}")
-        path.append(target)
     else:
-        # Multi-step upgrade required
         logger.warning(f"Multi-step upgrade required: {current} → {target} ({minor_diff} minor versions)")
-        
-        # Build intermediate versions
-        for minor in range(current.minor + 1, target.minor + 1):
-            # For intermediate steps, use the latest known patch version
-            # or default to .0 if we don't have patch info
-            if minor == target.minor:
-                # Final step: use target version
-                intermediate = target
-            else:
-                # Intermediate step: suggest latest patch for that minor
-                # In practice, kubeadm will use the latest available patch
-                intermediate = Version(f"{current.major}.{minor}.0")
-            
-            path.append(intermediate)
-            logger.info(f"  Step {len(path)}: upgrade to {intermediate}")
-    
+
+    # One step per intermediate minor, then the target itself.
+    # Intermediate steps default to .0 — in practice kubeadm will use
+    # the latest available patch for that minor
+    path = tuple(
+        [Version(current.major, minor, 0)
+         for minor in range(current.minor + 1, target.minor)]
+        + [target]
+    )
+
+    logger.info(f"Upgrade path: {' → '.join(str(v) for v in path)}")
     return path
 
 
+# TTL cache for the stable-version fetch: a successful answer is good
+# for an hour, a failed fetch is retried after a minute. The verdict is
+# network- and time-dependent, so it must never be frozen for the
+# process lifetime
+_STABLE_TTL_OK = 3600.0
+_STABLE_TTL_ERR = 60.0
+_stable_version_cache = None  # (fetched_at, ttl, Version or None)
+
+
 def get_latest_stable_version() -> Optional[Version]:
     """
     Fetch the latest stable Kubernetes version from official source
-    Returns None if unable to fetch
+    Returns None if unable to fetch; results are cached with a TTL
     """
+    global _stable_version_cache
+
+    if _stable_version_cache is not None:
+        fetched_at, ttl, cached = _stable_version_cache
+        if time.monotonic() - fetched_at < ttl:
+            return cached
+
     try:
         with urllib.request.urlopen('https://dl.k8s.io/release/stable.txt', timeout=5) as response:
             version_str = response.read().decode('utf-8').strip()
-            return Version(version_str)
+            result = Version.parse(version_str)
+            _stable_version_cache = (time.monotonic(), _STABLE_TTL_OK, result)
+            return result
     except Exception as e:
         logger.warning(f"Failed to fetch latest Kubernetes version: {e}")
+        _stable_version_cache = (time.monotonic(), _STABLE_TTL_ERR, None)
         return None
 
 
@@ -148,9 +168,14 @@ def validate_version_string(version: str) -> Tuple[bool, str]:
     """
     Validate a version string format
     Returns (is_valid, message)
+
+    Not cached: the verdict depends on the latest stable release,
+    which changes over time. Parsing is cached via parse_version and
+    the stable-release fetch has its own TTL cache, so repeated calls
+    stay cheap without freezing a stale rejection
     """
     try:
-        v = Version(version)
+        v = parse_version(version)
         
         # Kubernetes version constraints
         if v.major != 1:
@@ -174,10 +199,12 @@ def validate_version_string(version: str) -> Tuple[bool, str]:
         return False, f"Invalid version format: {e}"
 
 
+@functools.lru_cache(maxsize=256)
 def get_upgrade_warnings(current: Version, target: Version) -> List[str]:
     """
     Get warnings about the upgrade path
-    Returns list of warning messages
+    Returns list of warning messages; cached, so callers must not
+    mutate the returned list
     """
     warnings = []
     
@@ -226,15 +253,17 @@ def get_upgrade_warnings(current: Version, target: Version) -> List[str]:
 
 def get_next_minor_version(current: Version) -> Version:
     """Get the next minor version (e.g., 1.27.4 → 1.28.0)"""
-    return Version(f"{current.major}.{current.minor + 1}.0")
+    return Version(current.major, current.minor + 1, 0)
 
 
+@functools.lru_cache(maxsize=256)
 def is_patch_upgrade(current: Version, target: Version) -> bool:
     """Check if this is only a patch version upgrade"""
     return current.major == target.major and current.minor == target.minor
 
 
-def format_upgrade_path_message(path: List[Version]) -> str:
+@functools.lru_cache(maxsize=256)
+def format_upgrade_path_message(path: Tuple[Version, ...]) -> str:
     """Format upgrade path for logging"""
     if not path:
         return "No upgrade needed"
@@ -3,6 +3,7 @@
 CUPCAKE - Control-plane Upgrade Platform for Continuous Kubernetes Automation and Evolution
 Main Entry Point for the Operator
 """
+import datetime
 import os
 import sys
 import logging
@@ -10,6 +11,8 @@ import kopf
 from kubernetes import client, config
 from prometheus_client import start_http_server, Counter, Gauge, Histogram
 
+from handlers import direct_update, scheduled_update, update_schedule
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -95,17 +98,26 @@ def configure(settings: kopf.OperatorSettings, **_):
     logger.info("Operator configuration complete")
 
 
+@kopf.on.startup()
+def start_node_cache(**_):
+    """Start the shared node watch so reconciles don't re-list nodes"""
+    from lib.node_cache import node_cache
+    node_cache.start()
+
+
+@kopf.on.cleanup()
+def flush_status_batcher(**_):
+    """Flush any queued status patches before the operator exits"""
+    from lib.state import status_batcher
+    status_batcher.flush()
+
+
 @kopf.on.probe(id='now')
 def get_current_timestamp(**kwargs):
     """Health probe that returns current timestamp"""
-    import datetime
     return datetime.datetime.now(datetime.timezone.utc).isoformat()
 
 
-# Import handlers after configuration
-from handlers import direct_update, scheduled_update, update_schedule
-
-# Register handlers
 logger.info("CUPCAKE operator starting...")
 
 